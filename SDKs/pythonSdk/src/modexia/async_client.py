@@ -3,17 +3,34 @@
 This module provides `AsyncModexiaClient`, an asynchronous counterpart to `ModexiaClient`.
 It leverages `httpx` and `asyncio` for non-blocking I/O, ideal for "Swarm"-style agents
 and high-concurrency environments.
+
+Create one client and reuse it; constructing a client per request throws away
+its connection pool. The client is an async context manager:
+
+    async with AsyncModexiaClient(api_key="mx_test_...") as mx:
+        await mx.transfer(recipient, amount=1.0)
+
+In a FastAPI app, open it once in the lifespan handler and share it:
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with AsyncModexiaClient(api_key=API_KEY) as mx:
+            app.state.mx = mx
+            yield
 """
 
 import os
 import re
+import json
 import time
+import random
 import asyncio
-import hashlib
 import logging
 import httpx
-from datetime import datetime
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any, List, Tuple, Union, Callable, Awaitable
 
 from .client import ModexiaAuthError, ModexiaPaymentError, ModexiaNetworkError
 from .models import (
@@ -22,10 +39,139 @@ from .models import (
 )
 
 import uuid
+from hashlib import sha256 as _sha256
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # optional speed-up, see the `orjson` extra
+    _json_loads = json.loads
+
+try:
+    import ijson
+except ImportError:  # optional, enables streamed parsing of large history pages
+    ijson = None
 
 logger = logging.getLogger("modexia.async")
 logger.addHandler(logging.NullHandler())
 
+# L402 ``WWW-Authenticate`` parameters; lenient about quoting (see `_negotiate_paywall`).
+_AMOUNT_RE = re.compile(r'amount=["\']?([^"\'\s,;]+)["\']?', re.IGNORECASE)
+_DEST_RE = re.compile(r'destination=["\']?([^"\'\s,;]+)["\']?', re.IGNORECASE)
+
+
+def _history_item(t: Dict[str, Any]) -> TransactionHistoryItem:
+    return TransactionHistoryItem(
+        txId=t.get("txId", ""),
+        type=t.get("type", ""),
+        amount=str(t.get("amount", "0")),
+        state=t.get("state", ""),
+        createdAt=t.get("createdAt", ""),
+        providerAddress=t.get("providerAddress"),
+        txHash=t.get("txHash")
+    )
+
+
+class _AiohttpClient:
+    """Thin adapter exposing the subset of ``httpx.AsyncClient`` used by the SDK
+    on top of an ``aiohttp.ClientSession``.
+
+    aiohttp's connection acquisition path is cheaper than httpx's under high
+    concurrency, so swarm-style agents can opt into it via
+    ``AsyncModexiaClient(..., http_backend="aiohttp")``. Responses are
+    materialized into ``httpx.Response`` objects so the rest of the client
+    (and callers of ``smart_fetch``) see the same types on both backends.
+
+    The session is created lazily on first use because aiohttp connectors must
+    be bound to a running event loop.
+    """
+
+    def __init__(self, base_url: str = "", timeout: float = 15.0, headers: Optional[Dict[str, str]] = None,
+                 limit: int = 100, keepalive_timeout: float = 60.0, store_cookies: bool = True):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("http_backend='aiohttp' requires aiohttp. Install it with: pip install modexiaagentpay[aiohttp]")
+        self._aiohttp = aiohttp
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._limit = limit
+        self._keepalive_timeout = keepalive_timeout
+        self._store_cookies = store_cookies
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            aiohttp = self._aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._limit, keepalive_timeout=self._keepalive_timeout),
+                headers=self.headers,
+                cookie_jar=None if self._store_cookies else aiohttp.DummyCookieJar(),
+            )
+        return self._session
+
+    async def request(self, method: str, url: str, *, params=None, headers=None, json=None,
+                      data=None, content=None, timeout=None, follow_redirects: bool = False,
+                      cookies=None, auth=None, **unsupported) -> httpx.Response:
+        if unsupported:
+            raise TypeError(
+                f"http_backend='aiohttp' does not support request arguments: {', '.join(sorted(unsupported))}. "
+                "Use the default httpx backend for these."
+            )
+        if not (url.startswith("http://") or url.startswith("https://")):
+            url = f"{self.base_url}{url}"
+        request = httpx.Request(method, url, params=params)
+        try:
+            async with self._get_session().request(
+                method, url, params=params, headers=headers, json=json,
+                data=content if content is not None else data,
+                cookies=cookies,
+                auth=self._basic_auth(auth),
+                allow_redirects=follow_redirects,
+                timeout=self._client_timeout(timeout),
+            ) as resp:
+                body = await resp.read()
+                # aiohttp has already decoded the body, so drop the encoding
+                # headers or httpx would try to decompress it a second time.
+                resp_headers = [
+                    (k, v) for k, v in resp.headers.items()
+                    if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+                ]
+                return httpx.Response(resp.status, headers=resp_headers, content=body, request=request)
+        except asyncio.TimeoutError as e:
+            raise httpx.TimeoutException(str(e) or "Request timed out", request=request)
+        except self._aiohttp.ClientError as e:
+            raise httpx.TransportError(str(e), request=request)
+
+    def _basic_auth(self, auth):
+        """Map httpx's ``(username, password)`` auth tuple onto aiohttp."""
+        if auth is None:
+            return None
+        if isinstance(auth, tuple) and len(auth) == 2:
+            return self._aiohttp.BasicAuth(*auth)
+        raise TypeError("http_backend='aiohttp' only supports auth=(username, password).")
+
+    def _client_timeout(self, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        if isinstance(timeout, httpx.Timeout):
+            return self._aiohttp.ClientTimeout(connect=timeout.connect, sock_read=timeout.read)
+        return self._aiohttp.ClientTimeout(total=timeout)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
 class AsyncModexiaClient:
     """Official Modexia Python Async Client.
 
@@ -33,10 +179,38 @@ class AsyncModexiaClient:
         client = AsyncModexiaClient(api_key="mx_test_...")
         await client.retrieve_balance()
         await client.transfer(recipient, amount=1.0)
+
+    The client is safe to share across tasks. Issue independent calls
+    concurrently with ``asyncio.gather`` rather than awaiting them one by one
+    so their network waits overlap::
+
+        balance, history = await asyncio.gather(client.retrieve_balance(), client.get_history())
+
+    For batches of payments, ``transfer_many()`` does this for you.
+
+    Pass ``http_backend="aiohttp"`` (requires the ``aiohttp`` extra) to run
+    requests over an aiohttp connection pool, which scales better than httpx
+    with many requests in flight. ``max_connections`` and ``keepalive_expiry``
+    tune the connection pool for large agent swarms.
+
+    With ``prefetch_identity=True`` the first ``transfer()`` also starts
+    ``validate_session()`` in the background, so the identity (and a warm
+    connection) is ready without an extra serial round-trip.
     """
 
+    HTTP_BACKENDS = ("httpx", "aiohttp")
+
     VERSION = "0.5.0"
     DEFAULT_TIMEOUT = 15.0
+    DEFAULT_MAX_CONNECTIONS = 200
+    DEFAULT_KEEPALIVE_EXPIRY = 60.0
+    DEFAULT_MAX_CONCURRENCY = 64
+    RETRY_BACKOFF_BASE = 0.5
+    RETRY_BACKOFF_CAP = 4.0
+    RETRY_BUDGET = 15.0
+    PAYWALL_CACHE_SIZE = 256
+    # History pages at least this large are parsed incrementally (needs `ijson`)
+    HISTORY_STREAM_THRESHOLD = 1000
 
     URLS = {
         "live": "https://api.modexia.software",
@@ -44,9 +218,20 @@ class AsyncModexiaClient:
         "local": "http://localhost:3001"
     }
 
-    def __init__(self, api_key: str, timeout: float = DEFAULT_TIMEOUT, base_url: Optional[str]=None, allow_insecure_http: bool = False):
+    def __init__(self, api_key: str, timeout: float = DEFAULT_TIMEOUT, base_url: Optional[str]=None, allow_insecure_http: bool = False,
+                 http_backend: str = "httpx", max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY, prefetch_identity: bool = False,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        if http_backend not in self.HTTP_BACKENDS:
+            raise ValueError(f"Unsupported http_backend: {http_backend!r}. Expected one of {self.HTTP_BACKENDS}.")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}.")
+
         self.api_key = api_key
         self.timeout = timeout
+        self.http_backend = http_backend
+        self.prefetch_identity = prefetch_identity
+        self.max_concurrency = max_concurrency
 
         if base_url:
             self.base_url = base_url
@@ -69,20 +254,59 @@ class AsyncModexiaClient:
             
         logger.info(f"Resolved base_url to {self.base_url} (Async)")
 
-        self.client = httpx.AsyncClient(
-            base_url=self.base_url,
-            timeout=self.timeout,
-            headers={
-                "x-modexia-key": self.api_key,
-                "Content-Type": "application/json",
-                "User-Agent": f"Modexia-Python-Async/{self.VERSION}"
-            }
-        )
+        headers = {
+            "x-modexia-key": self.api_key,
+            "Content-Type": "application/json",
+            "User-Agent": f"Modexia-Python-Async/{self.VERSION}",
+            "Accept-Encoding": "gzip, br",
+        }
+        # Concurrent calls to the API multiplex over HTTP/2 and share a pool
+        # far larger than httpx's defaults (10 keep-alive conns, 5s expiry).
+        if http_backend == "aiohttp":
+            self.client = _AiohttpClient(base_url=self.base_url, timeout=self.timeout, headers=headers,
+                                         limit=max_connections, keepalive_timeout=keepalive_expiry)
+        else:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers=headers,
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max(1, max_connections // 2),
+                    keepalive_expiry=keepalive_expiry,
+                ),
+            )
+
+        # Separate long-lived client for absolute URLs in `smart_fetch` so the
+        # API key never leaks to third parties and keep-alive connections to
+        # paywalled origins are reused across calls. It never stores cookies,
+        # so one fetch's third-party session state doesn't leak into the next.
+        if http_backend == "aiohttp":
+            self._external_client = _AiohttpClient(timeout=self.timeout, store_cookies=False)
+        else:
+            self._external_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60),
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            )
         self.identity = {}
+        self._identity_cache_ts: float = 0.0
+        self._identity_task: Optional[asyncio.Task] = None
+        # Bound in-flight API requests; status polls get their own smaller pool
+        # so bursts of `_poll_status` loops can't starve new payments. Created
+        # lazily so they bind to the loop the client is actually used on.
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # LRU of paywall terms learned from 402s: "host/path-prefix" -> (destination, amount)
+        self._paywall_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
 
     async def aclose(self):
-        """Close the underlying HTTPX client."""
+        """Close the underlying HTTP clients."""
+        if self._identity_task is not None:
+            self._identity_task.cancel()
+            self._identity_task = None
         await self.client.aclose()
+        await self._external_client.aclose()
 
     async def __aenter__(self):
         return self
@@ -95,35 +319,91 @@ class AsyncModexiaClient:
         res = await self._request("GET", "/api/v1/user/me")
         data = res.get('data', res)
         self.identity = data
+        # Stamp after the round-trip so the TTL window starts when the data is fresh.
+        self._identity_cache_ts = time.monotonic()
         logger.info(f"Connected to Modexia (Async) as: {data.get('username')}")
         return data
 
-    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        """Perform an async HTTP request with basic retry logic."""
+    @classmethod
+    def _retry_delay(cls, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before retry ``attempt``.
+
+        Honors a numeric ``Retry-After`` header, otherwise uses full-jitter
+        exponential backoff so concurrent clients don't retry in lockstep.
+        """
+        if response is not None and response.status_code in (429, 503):
+            try:
+                return max(0.0, float(response.headers.get("Retry-After", "")))
+            except ValueError:
+                pass
+        return random.uniform(0, min(cls.RETRY_BACKOFF_CAP, cls.RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+    def _semaphore(self, pool: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(pool)
+        if sem is None:
+            if pool == "poll":
+                limit = min(self.max_concurrency, max(8, self.max_concurrency // 4))
+            else:
+                limit = self.max_concurrency
+            sem = self._semaphores[pool] = asyncio.Semaphore(limit)
+        return sem
+
+    async def _request(self, method: str, endpoint: str, _pool: str = "default",
+                       _stream: Optional[Callable[[httpx.Response], Awaitable[Any]]] = None, **kwargs) -> Dict[str, Any]:
+        """Perform an async HTTP request with basic retry logic.
+
+        Transient failures are retried up to 3 times with jittered backoff, as
+        long as the total backoff sleep stays within ``RETRY_BUDGET`` seconds
+        (time spent on the requests themselves does not count).
+        At most ``max_concurrency`` requests are in flight in the default
+        pool; status polls (``_pool="poll"``) use a separate pool capped at
+        ``max(8, max_concurrency // 4)`` but never above ``max_concurrency``.
+
+        When ``_stream`` is given the response is streamed and a 200 is handed
+        to it unread; its result is returned as-is. Any other status has its
+        (small) body read and goes through the usual retry and error mapping.
+        """
         max_retries = 3
-        
+        waited = 0.0
+        sem = self._semaphore(_pool)
+
         for attempt in range(max_retries + 1):
             try:
-                response = await self.client.request(method, endpoint, **kwargs)
+                async with sem:
+                    if _stream is None:
+                        response = await self.client.request(method, endpoint, **kwargs)
+                    else:
+                        async with self.client.stream(method, endpoint, **kwargs) as response:
+                            if response.status_code == 200:
+                                return await _stream(response)
+                            await response.aread()
                 
-                # Retry on transient server errors
-                if response.status_code in [500, 502, 503, 504] and attempt < max_retries:
-                    await asyncio.sleep(0.5 * (2 ** attempt))
-                    continue
+                # Retry on rate limiting and transient server errors
+                if response.status_code in [429, 500, 502, 503, 504] and attempt < max_retries:
+                    delay = self._retry_delay(attempt, response)
+                    if waited + delay <= self.RETRY_BUDGET:
+                        waited += delay
+                        await asyncio.sleep(delay)
+                        continue
                     
                 if response.status_code in [401, 403]:
                     raise ModexiaAuthError(f"Unauthorized: {response.text}")
                 
                 if response.status_code >= 400 and response.status_code != 402:
-                    try: 
-                        err = response.json().get('error', response.text)
-                    except Exception: 
-                        excerpt = response.text[:512]
+                    # Only decode JSON bodies; proxy error pages are often large HTML
+                    err = None
+                    if "json" in response.headers.get("content-type", ""):
+                        try:
+                            err = _json_loads(response.content).get('error')
+                        except Exception:
+                            pass
+                    if not err:
+                        excerpt = response.content[:512].decode(response.encoding or "utf-8", errors="replace")
                         err = f"HTTP {response.status_code} at {endpoint}: {excerpt}"
                     raise ModexiaPaymentError(err)
                 
                 try:
-                    data = response.json() if response.content else {}
+                    data = _json_loads(response.content) if response.content else {}
                 except ValueError:
                     excerpt = response.text[:512]
                     raise ModexiaNetworkError(f"HTTP {response.status_code} returned non-JSON data: {excerpt}")
@@ -134,19 +414,56 @@ class AsyncModexiaClient:
                 return data
                 
             except httpx.RequestError as e:
-                if attempt == max_retries:
+                delay = self._retry_delay(attempt)
+                if attempt == max_retries or waited + delay > self.RETRY_BUDGET:
                     raise ModexiaNetworkError(f"Connection failed: {str(e)}")
-                await asyncio.sleep(0.5 * (2 ** attempt))
+                waited += delay
+                await asyncio.sleep(delay)
 
-    async def retrieve_balance(self) -> str:
-        """Return the current wallet balance."""
-        if not self.identity:
-            await self.validate_session()
+    async def retrieve_balance(self, ttl: float = 0.0) -> str:
+        """Return the current wallet balance.
+
+        Args:
+            ttl: seconds a previously fetched balance may be reused for. The
+                default of 0 always queries the server, except that a
+                background validation still pending from `transfer()` is
+                awaited and used instead of issuing a second request.
+        """
+        if self._identity_task is not None:
+            task, self._identity_task = self._identity_task, None
+            if not task.done():
+                # Join a background validation still in flight from
+                # `transfer()`; if it fails, the query below raises instead.
+                try:
+                    await task
+                except Exception:
+                    pass
+                else:
+                    return self.identity.get("balance", "0")
+            # A finished prefetch may predate the payment that started it, so
+            # it is only reused through the ttl check below.
+        if ttl > 0 and self.identity and (time.monotonic() - self._identity_cache_ts) < ttl:
+            return self.identity.get("balance", "0")
+        await self.validate_session()
         return self.identity.get("balance", "0")
 
-    async def get_balance(self) -> str:
+    def _start_identity_prefetch(self):
+        """Begin `validate_session()` in the background if identity isn't loaded yet."""
+        if not self.prefetch_identity or self.identity or self._identity_task is not None:
+            return
+        self._identity_task = asyncio.create_task(self.validate_session())
+        self._identity_task.add_done_callback(self._identity_prefetch_done)
+
+    @staticmethod
+    def _identity_prefetch_done(task: asyncio.Task):
+        # Retrieve the exception so asyncio doesn't warn about it; whoever
+        # needs the identity re-queries and surfaces the error.
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Background session validation failed: %s", task.exception())
+
+    async def get_balance(self, ttl: float = 0.0) -> str:
         """Alias for `retrieve_balance()`."""
-        return await self.retrieve_balance()
+        return await self.retrieve_balance(ttl=ttl)
 
     async def transfer(self, recipient: str, amount: float, idempotency_key: Optional[str] = None, wait: bool = True) -> PaymentReceipt:
         """Create a payment from the authenticated agent to `recipient` asynchronously."""
@@ -154,11 +471,16 @@ class AsyncModexiaClient:
             raise ValueError(f"Invalid recipient address format: {recipient}. Must be a 42-character hex string starting with 0x.")
             
         if not idempotency_key:
-            intent_str = f"{recipient}_{amount}_{uuid.uuid4()}"
-            ikey = hashlib.sha256(intent_str.encode()).hexdigest()
+            # Random per call rather than bucketed by time: two deliberate
+            # transfers of the same amount must not collapse into one payment.
+            # The raw uuid bytes are hashed directly, skipping str formatting.
+            h = _sha256(f"{recipient}_{amount}_".encode("ascii"))
+            h.update(uuid.uuid4().bytes)
+            ikey = h.hexdigest()
         else:
             ikey = idempotency_key
             
+        self._start_identity_prefetch()
         payload = {"providerAddress": recipient, "amount": str(amount), "idempotencyKey": ikey}
         data = await self._request("POST", "/api/v1/agent/pay", json=payload)
 
@@ -172,42 +494,149 @@ class AsyncModexiaClient:
             errorReason=data.get("error")
         )
 
+    async def transfer_many(self, transfers: List[Tuple[str, float]], wait: bool = True) -> List[Union[PaymentReceipt, Exception]]:
+        """Submit several transfers concurrently.
+
+        All payments are submitted at once with ``asyncio.gather`` and, when
+        ``wait`` is True, the pending ones are polled together so their
+        status checks overlap instead of running back to back.
+
+        Args:
+            transfers: ``(recipient, amount)`` pairs.
+            wait: if True, poll until every submitted transfer settles or times out.
+
+        Returns:
+            One entry per input pair, in order: a ``PaymentReceipt`` or the
+            exception raised for that transfer.
+        """
+        results = await asyncio.gather(
+            *(self.transfer(recipient, amount, wait=False) for recipient, amount in transfers),
+            return_exceptions=True,
+        )
+        if not wait:
+            return results
+
+        pending = [r.txId for r in results if isinstance(r, PaymentReceipt) and r.success]
+        settled = await self._poll_statuses(pending)
+        return [settled.get(r.txId, r) if isinstance(r, PaymentReceipt) else r for r in results]
+
     async def _poll_status(self, tx_id: str) -> PaymentReceipt:
         """Poll the server asynchronously for transaction status until timeout."""
-        start = time.time()
-        while (time.time() - start) < 30:
-            data = await self._request("GET", f"/api/v1/agent/transaction/{tx_id}")
-            state = data.get("state", "").upper()
-            
-            if state in ["COMPLETE", "COMPLETED"]:
-                return PaymentReceipt(success=True, txId=tx_id, status="COMPLETE", txHash=data.get("txHash"))
-            if state == "FAILED":
-                raise ModexiaPaymentError(f"Transfer Failed: {data.get('errorReason')}")
-            
-            await asyncio.sleep(2)
-            
-        raise TimeoutError(f"Transaction {tx_id} did not settle within 30 seconds. Status remains PENDING.")
+        result = (await self._poll_statuses([tx_id]))[tx_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _poll_statuses(self, tx_ids: List[str]) -> Dict[str, Union[PaymentReceipt, Exception]]:
+        """Poll several transactions until each settles, fails or times out.
+
+        Every tick queries all still-pending transactions in parallel. Failures
+        are returned in place of a receipt rather than raised, so one bad
+        transaction does not abort the others.
+
+        Ticks back off exponentially from 250ms to a 2s cap with a little
+        jitter, so fast confirmations return quickly without hammering the
+        API for slow ones.
+        """
+        results: Dict[str, Union[PaymentReceipt, Exception]] = {}
+        pending = list(dict.fromkeys(tx_ids))
+        attempt = 0
+        start = time.monotonic()
+        while pending and (time.monotonic() - start) < 30:
+            responses = await asyncio.gather(
+                *(self._request("GET", f"/api/v1/agent/transaction/{tx_id}", _pool="poll") for tx_id in pending),
+                return_exceptions=True,
+            )
+            still_pending = []
+            for tx_id, data in zip(pending, responses):
+                if isinstance(data, BaseException):
+                    if not isinstance(data, Exception):
+                        raise data
+                    results[tx_id] = data
+                    continue
+
+                state = data.get("state", "").upper()
+                if state in ["COMPLETE", "COMPLETED"]:
+                    results[tx_id] = PaymentReceipt(success=True, txId=tx_id, status="COMPLETE", txHash=data.get("txHash"))
+                elif state == "FAILED":
+                    results[tx_id] = ModexiaPaymentError(f"Transfer Failed: {data.get('errorReason')}")
+                else:
+                    still_pending.append(tx_id)
+
+            pending = still_pending
+            if pending:
+                await asyncio.sleep(min(2.0, 0.25 * (1.5 ** attempt)) + random.uniform(0, 0.1))
+                attempt += 1
+
+        for tx_id in pending:
+            results[tx_id] = TimeoutError(f"Transaction {tx_id} did not settle within 30 seconds. Status remains PENDING.")
+        return results
 
     async def get_history(self, limit: int = 5) -> TransactionHistoryResponse:
-        """Fetch the transaction history for the authenticated agent."""
-        data = await self._request("GET", f"/api/v1/user/transactions?limit={limit}")
-        transactions = []
-        for t in data.get("transactions", []):
-            transactions.append(TransactionHistoryItem(
-                txId=t.get("txId", ""),
-                type=t.get("type", ""),
-                amount=str(t.get("amount", "0")),
-                state=t.get("state", ""),
-                createdAt=t.get("createdAt", ""),
-                providerAddress=t.get("providerAddress"),
-                txHash=t.get("txHash")
-            ))
-            
+        """Fetch the transaction history for the authenticated agent.
+
+        Pages of ``HISTORY_STREAM_THRESHOLD`` or more transactions are parsed
+        incrementally as the body arrives when ``ijson`` is installed, so the
+        full JSON document is never held in memory at once.
+        """
+        endpoint = "/api/v1/user/transactions"
+        params = {"limit": limit}
+        if limit >= self.HISTORY_STREAM_THRESHOLD and ijson is not None and isinstance(self.client, httpx.AsyncClient):
+            data = await self._request("GET", endpoint, params=params, _stream=self._parse_history_stream)
+            if isinstance(data, TransactionHistoryResponse):
+                return data
+        else:
+            data = await self._request("GET", endpoint, params=params)
+        transactions = [_history_item(t) for t in data.get("transactions", ())]
+
         return TransactionHistoryResponse(
             transactions=transactions,
             hasMore=data.get("hasMore", False)
         )
 
+    async def _parse_history_stream(self, response: httpx.Response) -> TransactionHistoryResponse:
+        """Build a history page from a streamed response body using ijson events."""
+        transactions = []
+        top_level: Dict[str, Any] = {}
+        builder = None
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events, use_float=True)
+
+        def consume():
+            nonlocal builder
+            for prefix, event, value in events:
+                if prefix == "transactions.item" and event == "start_map":
+                    builder = ijson.ObjectBuilder()
+                if builder is not None:
+                    builder.event(event, value)
+                    if prefix == "transactions.item" and event == "end_map":
+                        transactions.append(_history_item(builder.value))
+                        builder = None
+                elif prefix in ("success", "error", "errorReason", "hasMore"):
+                    top_level[prefix] = value
+            del events[:]
+
+        received = False
+        try:
+            async for chunk in response.aiter_bytes():
+                received = received or bool(chunk)
+                parser.send(chunk)
+                consume()
+            # An empty body means `{}`, as in `_request`
+            if received:
+                parser.close()
+                consume()
+        except ijson.JSONError as e:
+            raise ModexiaNetworkError(f"HTTP {response.status_code} returned non-JSON data: {e}")
+
+        if top_level.get("success") is False:
+            raise ModexiaPaymentError(top_level.get("error", top_level.get("errorReason", "Unknown logical API error")))
+
+        return TransactionHistoryResponse(
+            transactions=transactions,
+            hasMore=top_level.get("hasMore", False)
+        )
+
     # ═══════════════════════════════════════════════════════════════════
     #  VAULT — Payment Channels for Micro & High-Frequency Transactions
     # ═══════════════════════════════════════════════════════════════════
@@ -276,7 +705,7 @@ class AsyncModexiaClient:
 
     async def list_channels(self, limit: int = 50) -> list[ChannelStatus]:
         """List all payment channels for the authenticated agent asynchronously."""
-        res = await self._request("GET", f"/api/v1/vault/channels?limit={limit}")
+        res = await self._request("GET", "/api/v1/vault/channels", params={"limit": limit})
         channels = []
         for d in res.get("data", []):
             channels.append(ChannelStatus(
@@ -291,7 +720,7 @@ class AsyncModexiaClient:
             ))
         return channels
 
-    async def smart_fetch(self, method: str, url: str, max_auto_pay: Optional[float] = None, **kwargs) -> httpx.Response:
+    async def smart_fetch(self, method: str, url: str, max_auto_pay: Optional[float] = None, prepay: bool = False, **kwargs) -> httpx.Response:
         """Fetch an external resource asynchronously and auto-pay 402 paywalls.
 
         Sends an HTTP request using the specified ``method``; if the remote
@@ -308,10 +737,19 @@ class AsyncModexiaClient:
         a 1-second delay between attempts to handle eventual-consistency
         scenarios where the server hasn't verified the payment yet.
 
+        Paywall terms are remembered per host and path prefix. With
+        ``prepay=True`` a known paywall is paid before the first request and
+        the proof is sent up front, saving the initial 402 round-trip. URLs
+        directly under the host root are never pre-paid. If the provider
+        answers 402 with different terms, or still answers 402 after the
+        usual retries, the remembered terms are dropped and that response is
+        returned; a call never pays more than once.
+
         Args:
             method: HTTP method (GET, POST, PUT, DELETE, etc.).
             url: Fully-qualified URL of the resource.
             max_auto_pay: Maximum amount to automatically pay (e.g., 0.50). If the requested amount exceeds this limit, the 402 response is returned without payment.
+            prepay: Pay previously seen paywalls for this host/prefix before requesting.
             **kwargs: Passed directly to ``httpx.AsyncClient.request`` (e.g.
                 ``params``, ``headers``, ``json``, ``data``).
 
@@ -320,57 +758,126 @@ class AsyncModexiaClient:
         """
 
         kwargs.setdefault("timeout", self.timeout)
-        headers = kwargs.pop("headers", {}) or {}
+        headers = kwargs.pop("headers", None) or {}
         is_absolute = url.startswith("http://") or url.startswith("https://")
+        cache_key = self._paywall_key(url)
 
         try:
-            if is_absolute:
-                async with httpx.AsyncClient(timeout=self.timeout) as temp_client:
-                    response = await temp_client.request(method, url, headers=headers, **kwargs)
-            else:
-                response = await self.client.request(method, url, headers=headers, **kwargs)
+            http = self._external_client if is_absolute else self.client
+
+            prepayment = await self._prepay_paywall(cache_key, max_auto_pay) if prepay and cache_key else None
+            prepaid = prepayment is not None
+            if prepaid:
+                receipt, paid_terms = prepayment
+                headers = {**headers, "Authorization": f"L402 {receipt.txId}", "X-Payment-Proof": str(receipt.txId)}
+
+            response = await http.request(method, url, headers=headers, **kwargs)
 
             if response.status_code == 402:
-                # Let ModexiaAuthError (bad key) and ModexiaNetworkError (no internet) bubble up
-                try:
-                    receipt = await self._negotiate_paywall(response, max_auto_pay)
-                except ModexiaPaymentError:
-                    logger.exception("Payment negotiation failed for %s", url)
+                if prepaid and self._parse_paywall_terms(response) != paid_terms:
+                    # The provider's price or destination changed, so the proof
+                    # we sent can never be accepted; don't wait on retries.
+                    logger.warning("Paywall terms for %s changed; pre-payment %s was not accepted", url, receipt.txId)
+                    self._evict_paywall_terms(cache_key, paid_terms)
                     return response
 
-                if receipt and receipt.success:
-                    headers["Authorization"] = f"L402 {receipt.txId}"
-                    headers["X-Payment-Proof"] = str(receipt.txId)
-
-                    # Retry loop — the server may need a moment to verify payment
-                    max_retries = 3
-                    for attempt in range(max_retries):
-                        if is_absolute:
-                            async with httpx.AsyncClient(timeout=self.timeout) as temp_client:
-                                retry_resp = await temp_client.request(method, url, headers=headers, **kwargs)
-                        else:
-                            retry_resp = await self.client.request(method, url, headers=headers, **kwargs)
-
-                        if retry_resp.status_code != 402:
-                            return retry_resp
-                        logger.warning(
-                            "Server still returning 402 after payment (attempt %d/%d)",
-                            attempt + 1, max_retries,
-                        )
-                        await asyncio.sleep(1)
-                    return retry_resp
+                if not prepaid:
+                    # Let ModexiaAuthError (bad key) and ModexiaNetworkError (no internet) bubble up
+                    try:
+                        receipt = await self._negotiate_paywall(response, max_auto_pay, cache_key=cache_key)
+                    except ModexiaPaymentError:
+                        logger.exception("Payment negotiation failed for %s", url)
+                        return response
+
+                    if not (receipt and receipt.success):
+                        return response
+
+                    # Build a new dict so the caller's headers are never mutated
+                    headers = {**headers, "Authorization": f"L402 {receipt.txId}", "X-Payment-Proof": str(receipt.txId)}
+
+                # Retry loop — the server may need a moment to verify payment
+                max_retries = 3
+                for attempt in range(max_retries):
+                    retry_resp = await http.request(method, url, headers=headers, **kwargs)
+
+                    if retry_resp.status_code != 402:
+                        return retry_resp
+                    logger.warning(
+                        "Server still returning 402 after payment (attempt %d/%d)",
+                        attempt + 1, max_retries,
+                    )
+                    await asyncio.sleep(1)
+                if prepaid:
+                    self._evict_paywall_terms(cache_key, paid_terms)
+                return retry_resp
 
             return response
         except httpx.RequestError as e:
             raise ModexiaNetworkError(f"Connection failed: {str(e)}")
 
-    async def _negotiate_paywall(self, response_obj: httpx.Response, max_auto_pay: Optional[float] = None) -> Optional[PaymentReceipt]:
+    def _paywall_key(self, url: str) -> Optional[str]:
+        """Cache key for paywall terms: host plus the URL's parent path.
+
+        Returns ``None`` for top-level paths, which share no prefix that could
+        reasonably be assumed to carry the same price.
+        """
+        if not (url.startswith("http://") or url.startswith("https://")):
+            url = f"{self.base_url}{url}"
+        parsed = urlparse(url)
+        prefix = parsed.path.rsplit("/", 1)[0]
+        if not prefix:
+            return None
+        return parsed.netloc + prefix
+
+    @staticmethod
+    def _parse_paywall_terms(response_obj: httpx.Response) -> Optional[Tuple[str, float]]:
+        """Extract ``(destination, amount)`` from a 402 ``WWW-Authenticate`` header."""
+        auth_header = response_obj.headers.get("WWW-Authenticate", "")
+        amt = _AMOUNT_RE.search(auth_header)
+        dst = _DEST_RE.search(auth_header)
+        if amt and dst:
+            return dst.group(1), float(amt.group(1))
+        return None
+
+    def _evict_paywall_terms(self, cache_key: str, terms: Tuple[str, float]):
+        """Forget ``terms`` for ``cache_key`` unless a concurrent fetch has already replaced them."""
+        if self._paywall_cache.get(cache_key) == terms:
+            del self._paywall_cache[cache_key]
+
+    async def _prepay_paywall(self, cache_key: str, max_auto_pay: Optional[float] = None
+                              ) -> Optional[Tuple[PaymentReceipt, Tuple[str, float]]]:
+        """Pay remembered paywall terms for ``cache_key``, if any.
+
+        Returns the receipt of a successful payment together with the
+        ``(destination, amount)`` actually paid — the cache entry may change
+        while the transfer is in flight. Otherwise returns ``None`` so the
+        caller falls back to reactive 402 negotiation.
+        """
+        terms = self._paywall_cache.get(cache_key)
+        if terms is None:
+            return None
+        self._paywall_cache.move_to_end(cache_key)
+        destination, amount_val = terms
+        if max_auto_pay is not None and amount_val > max_auto_pay:
+            return None
+        try:
+            receipt = await self.transfer(destination, amount_val)
+        except ModexiaPaymentError:
+            logger.exception("Pre-payment failed for %s", cache_key)
+            return None
+        return (receipt, terms) if receipt.success else None
+
+    async def _negotiate_paywall(self, response_obj: httpx.Response, max_auto_pay: Optional[float] = None,
+                                 cache_key: Optional[str] = None) -> Optional[PaymentReceipt]:
         """Parse a 402 paywall ``WWW-Authenticate`` header and pay it asynchronously.
 
         The regex is intentionally lenient — it handles quoted, single-quoted,
         and unquoted values so we work with heterogeneous server
         implementations.
 
+        When ``cache_key`` is given, the parsed terms are remembered for
+        ``smart_fetch(..., prepay=True)``.
+
         Returns:
             A ``PaymentReceipt`` on success, otherwise ``None``.
 
@@ -378,15 +885,18 @@ class AsyncModexiaClient:
             ModexiaPaymentError: if the transfer itself fails.
         """
 
-        auth_header = response_obj.headers.get("WWW-Authenticate", "")
-        amt = re.search(r'amount=["\']?([^"\'\s,;]+)["\']?', auth_header, re.IGNORECASE)
-        dst = re.search(r'destination=["\']?([^"\'\s,;]+)["\']?', auth_header, re.IGNORECASE)
+        terms = self._parse_paywall_terms(response_obj)
 
-        if amt and dst:
-            amount_val = float(amt.group(1))
+        if terms:
+            destination, amount_val = terms
+            if cache_key is not None:
+                self._paywall_cache[cache_key] = terms
+                self._paywall_cache.move_to_end(cache_key)
+                if len(self._paywall_cache) > self.PAYWALL_CACHE_SIZE:
+                    self._paywall_cache.popitem(last=False)
             if max_auto_pay is not None and amount_val > max_auto_pay:
                 logger.warning(f"Requested L402 paywall amount ({amount_val}) exceeds max_auto_pay limit ({max_auto_pay}). Declining auto-payment.")
                 return None
-            return await self.transfer(dst.group(1), amount_val)
+            return await self.transfer(destination, amount_val)
 
         return None
@@ -21,7 +21,6 @@ import os
 import time
 import hashlib
 import logging
-from datetime import datetime
 from typing import Optional, Dict, Any, List
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -241,8 +240,8 @@ class ModexiaClient:
 
         Returns a PaymentReceipt on success.
         """
-        start = time.time()
-        while (time.time() - start) < 30:
+        start = time.monotonic()
+        while (time.monotonic() - start) < 30:
             data = self._request("GET", f"/api/v1/agent/transaction/{tx_id}")
             
             state = data.get("state", "").upper()
@@ -1,8 +1,13 @@
+import sys
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
 
+# Slotted dataclasses skip the per-instance __dict__, which adds up for large
+# history pages. `slots=` only exists on Python 3.10+.
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_SLOTS)
 class PaymentReceipt:
     success: bool
     status: str
@@ -10,7 +15,7 @@ class PaymentReceipt:
     txHash: Optional[str] = None
     errorReason: Optional[str] = None
     
-@dataclass
+@dataclass(**_SLOTS)
 class TransactionHistoryItem:
     txId: str
     type: str
@@ -20,12 +25,12 @@ class TransactionHistoryItem:
     providerAddress: Optional[str] = None
     txHash: Optional[str] = None
     
-@dataclass
+@dataclass(**_SLOTS)
 class TransactionHistoryResponse:
     transactions: List[TransactionHistoryItem]
     hasMore: bool
 
-@dataclass
+@dataclass(**_SLOTS)
 class ChannelReceipt:
     """HMAC-signed receipt returned by each off-chain consume call."""
     channelId: str
@@ -34,7 +39,7 @@ class ChannelReceipt:
     hmac: str
     timestamp: int = 0
 
-@dataclass
+@dataclass(**_SLOTS)
 class ConsumeResponse:
     """Result of a single micro-payment inside a payment channel."""
     success: bool
@@ -42,7 +47,7 @@ class ConsumeResponse:
     remaining: str
     isDuplicate: bool = False
 
-@dataclass
+@dataclass(**_SLOTS)
 class ChannelStatus:
     """Current state of a payment channel."""
     channelId: str
@@ -63,3 +63,575 @@ async def test_intent_based_idempotency_hash_async(client, httpx_mock):
     assert receipt.txHash == "0x456"
     
     await client.aclose()
+
+def test_unknown_http_backend_rejected():
+    with pytest.raises(ValueError):
+        AsyncModexiaClient(api_key=API_KEY, http_backend="urllib")
+
+@pytest.mark.asyncio
+async def test_aiohttp_backend_retrieve_balance():
+    web = pytest.importorskip("aiohttp.web")
+    from aiohttp.test_utils import TestServer
+
+    seen_keys = []
+
+    async def me(request):
+        seen_keys.append(request.headers.get("x-modexia-key"))
+        return web.json_response({"data": {"balance": "42.00", "username": "agent3"}})
+
+    app = web.Application()
+    app.router.add_get("/api/v1/user/me", me)
+    async with TestServer(app) as server:
+        client = AsyncModexiaClient(api_key=API_KEY, base_url=str(server.make_url("")), http_backend="aiohttp")
+        balance = await client.retrieve_balance()
+        await client.aclose()
+
+    assert balance == "42.00"
+    assert seen_keys == [API_KEY]
+
+@pytest.mark.asyncio
+async def test_smart_fetch_absolute_url_does_not_send_api_key(client, httpx_mock):
+    httpx_mock.add_response(url="https://provider.example/data", json={"ok": True}, method="GET")
+
+    response = await client.smart_fetch("GET", "https://provider.example/data")
+
+    assert response.status_code == 200
+    assert "x-modexia-key" not in httpx_mock.get_requests()[0].headers
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_transfer_many_async(client, httpx_mock):
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_a"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_b"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_a",
+        json={"state": "COMPLETED", "txHash": "0xa"},
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_b",
+        json={"state": "FAILED", "errorReason": "insufficient funds"},
+        method="GET"
+    )
+
+    recipient = "0x1234567890123456789012345678901234567890"
+    results = await client.transfer_many([(recipient, 1.0), (recipient, 2.0)])
+
+    by_tx = {r.txId: r for r in results if isinstance(r, PaymentReceipt)}
+    errors = [r for r in results if isinstance(r, Exception)]
+    assert len(results) == 2
+    assert list(by_tx) == ["tx_a"] and by_tx["tx_a"].txHash == "0xa"
+    assert len(errors) == 1 and "insufficient funds" in str(errors[0])
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_smart_fetch_pays_paywall(client, httpx_mock):
+    recipient = "0x1234567890123456789012345678901234567890"
+    httpx_mock.add_response(
+        url="https://provider.example/article",
+        status_code=402,
+        headers={"WWW-Authenticate": f'L402 amount="0.25", destination="{recipient}"'},
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_paywall"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_paywall",
+        json={"state": "COMPLETE"},
+        method="GET"
+    )
+    httpx_mock.add_response(url="https://provider.example/article", json={"body": "paid"}, method="GET")
+
+    response = await client.smart_fetch("GET", "https://provider.example/article")
+
+    assert response.json() == {"body": "paid"}
+    retry = httpx_mock.get_requests(url="https://provider.example/article")[-1]
+    assert retry.headers["Authorization"] == "L402 tx_paywall"
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_retrieve_balance_ttl_cache(client, httpx_mock):
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/me",
+        json={"data": {"balance": "7.00", "username": "agent2"}},
+        method="GET"
+    )
+
+    assert await client.retrieve_balance(ttl=60) == "7.00"
+    assert await client.get_balance(ttl=60) == "7.00"
+    assert len(httpx_mock.get_requests()) == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_get_history_async(client, httpx_mock):
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/transactions?limit=1",
+        json={
+            "transactions": [
+                {"txId": "t1", "type": "payment", "amount": 1.0, "state": "COMPLETE", "createdAt": "2026", "providerAddress": "0x1"}
+            ],
+            "hasMore": True
+        },
+        method="GET"
+    )
+
+    history = await client.get_history(limit=1)
+
+    assert isinstance(history, TransactionHistoryResponse)
+    assert history.transactions[0].txId == "t1"
+    assert history.transactions[0].amount == "1.0"
+    assert history.hasMore is True
+    await client.aclose()
+
+def _spy_history_stream(client):
+    calls = []
+    parse = client._parse_history_stream
+
+    async def spy(response):
+        calls.append(response.status_code)
+        return await parse(response)
+
+    client._parse_history_stream = spy
+    return calls
+
+@pytest.mark.asyncio
+async def test_get_history_streams_large_pages(client, httpx_mock):
+    pytest.importorskip("ijson")
+    rows = [
+        {"txId": f"t{i}", "type": "payment", "amount": 0.5, "state": "COMPLETE", "createdAt": "2026", "meta": {"n": i}}
+        for i in range(client.HISTORY_STREAM_THRESHOLD)
+    ]
+    httpx_mock.add_response(
+        url=f"https://sandbox.modexia.software/api/v1/user/transactions?limit={client.HISTORY_STREAM_THRESHOLD}",
+        json={"transactions": rows, "hasMore": True},
+        method="GET"
+    )
+
+    streamed = _spy_history_stream(client)
+    history = await client.get_history(limit=client.HISTORY_STREAM_THRESHOLD)
+
+    assert streamed == [200]
+    assert len(history.transactions) == client.HISTORY_STREAM_THRESHOLD
+    assert history.transactions[-1].txId == f"t{client.HISTORY_STREAM_THRESHOLD - 1}"
+    assert history.transactions[0].amount == "0.5"
+    assert history.hasMore is True
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_async_context_manager_closes_clients():
+    async with AsyncModexiaClient(api_key=API_KEY) as mx:
+        assert isinstance(mx, AsyncModexiaClient)
+    assert mx.client.is_closed
+    assert mx._external_client.is_closed
+
+@pytest.mark.asyncio
+async def test_request_retries_honor_retry_after(client, httpx_mock, monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr("modexia.async_client.asyncio.sleep", fake_sleep)
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/me",
+        status_code=503,
+        headers={"Retry-After": "2"},
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/me",
+        status_code=502,
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/me",
+        json={"data": {"balance": "1.00"}},
+        method="GET"
+    )
+
+    assert await client.retrieve_balance() == "1.00"
+    assert sleeps[0] == 2.0
+    assert 0 <= sleeps[1] <= client.RETRY_BACKOFF_BASE * 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_smart_fetch_prepays_known_paywall(client, httpx_mock):
+    recipient = "0x1234567890123456789012345678901234567890"
+    httpx_mock.add_response(
+        url="https://provider.example/articles/1",
+        status_code=402,
+        headers={"WWW-Authenticate": f'L402 amount="0.25", destination="{recipient}"'},
+        method="GET"
+    )
+    httpx_mock.add_response(url="https://provider.example/articles/1", json={"id": 1}, method="GET")
+    httpx_mock.add_response(url="https://provider.example/articles/2", json={"id": 2}, method="GET")
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_first"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_second"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_first",
+        json={"state": "COMPLETE"},
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_second",
+        json={"state": "COMPLETE"},
+        method="GET"
+    )
+
+    first = await client.smart_fetch("GET", "https://provider.example/articles/1", prepay=True)
+    second = await client.smart_fetch("GET", "https://provider.example/articles/2", prepay=True)
+
+    assert first.json() == {"id": 1}
+    assert second.json() == {"id": 2}
+    article_2_requests = httpx_mock.get_requests(url="https://provider.example/articles/2")
+    assert len(article_2_requests) == 1
+    assert article_2_requests[0].headers["Authorization"] == "L402 tx_second"
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_request_error_messages(client, httpx_mock):
+    from modexia import ModexiaPaymentError
+
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/vault/settle",
+        status_code=400,
+        json={"error": "Channel already settled"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/vault/status/ch_1",
+        status_code=404,
+        html="<html>" + "x" * 4096 + "</html>",
+        method="GET"
+    )
+
+    with pytest.raises(ModexiaPaymentError, match="Channel already settled"):
+        await client.settle_channel("ch_1")
+    with pytest.raises(ModexiaPaymentError) as excinfo:
+        await client.get_channel("ch_1")
+    assert str(excinfo.value).startswith("HTTP 404 at /api/v1/vault/status/ch_1: <html>")
+    assert len(str(excinfo.value)) < 600
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_transfer_prefetches_identity(httpx_mock):
+    client = AsyncModexiaClient(api_key=API_KEY, prefetch_identity=True)
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_prefetch"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/me",
+        json={"data": {"balance": "3.00", "username": "agent2"}},
+        method="GET"
+    )
+
+    await client.transfer("0x1234567890123456789012345678901234567890", 1.0, wait=False)
+    assert await client.retrieve_balance(ttl=60) == "3.00"
+    assert len(httpx_mock.get_requests(url="https://sandbox.modexia.software/api/v1/user/me")) == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_request_concurrency_is_bounded():
+    import asyncio
+
+    client = AsyncModexiaClient(api_key=API_KEY, max_concurrency=2)
+    in_flight = peak = 0
+
+    async def fake_request(method, endpoint, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"data": {"balance": "1.00"}})
+
+    client.client.request = fake_request
+    await asyncio.gather(*(client.validate_session() for _ in range(6)))
+
+    assert peak == 2
+    await client.aclose()
+
+def _gated_identity_transport(client, gate, calls):
+    async def fake_request(method, endpoint, **kwargs):
+        calls.append(endpoint)
+        if endpoint == "/api/v1/user/me":
+            await gate.wait()
+            return httpx.Response(200, json={"data": {"balance": "3.00"}})
+        return httpx.Response(200, json={"success": True, "txId": "tx_prefetch"})
+
+    client.client.request = fake_request
+
+@pytest.mark.asyncio
+async def test_transfer_prefetch_joined_while_pending():
+    import asyncio
+
+    client = AsyncModexiaClient(api_key=API_KEY, prefetch_identity=True)
+    gate, calls = asyncio.Event(), []
+    _gated_identity_transport(client, gate, calls)
+
+    await client.transfer("0x1234567890123456789012345678901234567890", 1.0, wait=False)
+    balance = asyncio.ensure_future(client.retrieve_balance())
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await balance == "3.00"
+    assert sorted(calls) == ["/api/v1/agent/pay", "/api/v1/user/me"]
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_finished_prefetch_not_reused_with_default_ttl():
+    import asyncio
+
+    client = AsyncModexiaClient(api_key=API_KEY, prefetch_identity=True)
+    gate, calls = asyncio.Event(), []
+    gate.set()
+    _gated_identity_transport(client, gate, calls)
+
+    await client.transfer("0x1234567890123456789012345678901234567890", 1.0, wait=False)
+    await client._identity_task
+
+    assert await client.retrieve_balance() == "3.00"
+    assert calls.count("/api/v1/user/me") == 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_aiohttp_backend_smart_fetch_matches_httpx_semantics():
+    web = pytest.importorskip("aiohttp.web")
+    from aiohttp.test_utils import TestServer
+
+    async def echo(request):
+        return web.json_response({
+            "body": (await request.read()).decode(),
+            "cookie": request.cookies.get("sid"),
+            "key": request.headers.get("x-modexia-key"),
+        })
+
+    async def moved(request):
+        raise web.HTTPFound("/echo")
+
+    app = web.Application()
+    app.router.add_post("/echo", echo)
+    app.router.add_get("/moved", moved)
+    async with TestServer(app) as server:
+        client = AsyncModexiaClient(api_key=API_KEY, http_backend="aiohttp")
+        echoed = await client.smart_fetch("POST", str(server.make_url("/echo")), content=b"payload", cookies={"sid": "1"})
+        redirect = await client.smart_fetch("GET", str(server.make_url("/moved")))
+        with pytest.raises(TypeError, match="files"):
+            await client.smart_fetch("POST", str(server.make_url("/echo")), files={"f": b"x"})
+        await client.aclose()
+
+    assert echoed.json() == {"body": "payload", "cookie": "1", "key": None}
+    assert redirect.status_code == 302
+
+@pytest.mark.asyncio
+async def test_get_history_stream_maps_errors_without_resending(client, httpx_mock):
+    pytest.importorskip("ijson")
+    from modexia import ModexiaPaymentError
+
+    limit = client.HISTORY_STREAM_THRESHOLD
+    httpx_mock.add_response(
+        url=f"https://sandbox.modexia.software/api/v1/user/transactions?limit={limit}",
+        status_code=400,
+        json={"error": "limit too large"},
+        method="GET"
+    )
+
+    with pytest.raises(ModexiaPaymentError, match="limit too large"):
+        await client.get_history(limit=limit)
+    assert len(httpx_mock.get_requests()) == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_get_history_stream_retries_transport_errors(client, httpx_mock, monkeypatch):
+    pytest.importorskip("ijson")
+
+    async def fake_sleep(delay):
+        pass
+
+    monkeypatch.setattr("modexia.async_client.asyncio.sleep", fake_sleep)
+    limit = client.HISTORY_STREAM_THRESHOLD
+    url = f"https://sandbox.modexia.software/api/v1/user/transactions?limit={limit}"
+    httpx_mock.add_exception(httpx.ReadError("connection reset"), url=url)
+    httpx_mock.add_response(url=url, json={"transactions": [], "hasMore": False}, method="GET")
+
+    history = await client.get_history(limit=limit)
+
+    assert history.transactions == []
+    assert len(httpx_mock.get_requests()) == 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_smart_fetch_prepay_stops_when_terms_change(client, httpx_mock):
+    recipient = "0x1234567890123456789012345678901234567890"
+    client._paywall_cache["provider.example/articles"] = (recipient, 0.25)
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_stale"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_stale",
+        json={"state": "COMPLETE"},
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://provider.example/articles/3",
+        status_code=402,
+        headers={"WWW-Authenticate": f'L402 amount="0.50", destination="{recipient}"'},
+        method="GET"
+    )
+
+    response = await client.smart_fetch("GET", "https://provider.example/articles/3", prepay=True)
+
+    assert response.status_code == 402
+    assert len(httpx_mock.get_requests(url="https://provider.example/articles/3")) == 1
+    assert "provider.example/articles" not in client._paywall_cache
+    await client.aclose()
+
+def test_paywall_key_skips_top_level_paths(client):
+    assert client._paywall_key("https://provider.example/article") is None
+    assert client._paywall_key("https://provider.example/articles/1") == "provider.example/articles"
+
+@pytest.mark.asyncio
+async def test_request_retries_after_timeout(client, httpx_mock, monkeypatch):
+    async def fake_sleep(delay):
+        pass
+
+    monkeypatch.setattr("modexia.async_client.asyncio.sleep", fake_sleep)
+    httpx_mock.add_exception(httpx.ReadTimeout("timed out"), url="https://sandbox.modexia.software/api/v1/user/me")
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/user/me",
+        json={"data": {"balance": "2.00"}},
+        method="GET"
+    )
+
+    assert await client.retrieve_balance() == "2.00"
+    assert len(httpx_mock.get_requests()) == 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_smart_fetch_does_not_carry_cookies_between_calls(client, httpx_mock):
+    httpx_mock.add_response(url="https://provider.example/a", headers={"Set-Cookie": "sid=abc; Path=/"}, method="GET")
+    httpx_mock.add_response(url="https://provider.example/b", method="GET")
+
+    await client.smart_fetch("GET", "https://provider.example/a")
+    await client.smart_fetch("GET", "https://provider.example/b")
+
+    second = httpx_mock.get_requests(url="https://provider.example/b")[0]
+    assert "cookie" not in second.headers
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_aiohttp_backend_smart_fetch_does_not_carry_cookies():
+    web = pytest.importorskip("aiohttp.web")
+    from aiohttp.test_utils import TestServer
+
+    async def set_cookie(request):
+        response = web.Response(text="ok")
+        response.set_cookie("sid", "abc")
+        return response
+
+    async def echo(request):
+        return web.json_response({"sid": request.cookies.get("sid")})
+
+    app = web.Application()
+    app.router.add_get("/a", set_cookie)
+    app.router.add_get("/b", echo)
+    async with TestServer(app) as server:
+        client = AsyncModexiaClient(api_key=API_KEY, http_backend="aiohttp")
+        await client.smart_fetch("GET", str(server.make_url("/a")))
+        second = await client.smart_fetch("GET", str(server.make_url("/b")))
+        await client.aclose()
+
+    assert second.json() == {"sid": None}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [5, 1000])
+async def test_get_history_same_result_streamed_or_buffered(client, httpx_mock, limit):
+    pytest.importorskip("ijson")
+    from modexia import ModexiaPaymentError
+
+    url = f"https://sandbox.modexia.software/api/v1/user/transactions?limit={limit}"
+    httpx_mock.add_response(url=url, json={"success": False, "errorReason": "rate plan exceeded"}, method="GET")
+    httpx_mock.add_response(url=url, content=b"", method="GET")
+    streamed = _spy_history_stream(client)
+
+    with pytest.raises(ModexiaPaymentError, match="rate plan exceeded"):
+        await client.get_history(limit=limit)
+    history = await client.get_history(limit=limit)
+
+    assert history.transactions == [] and history.hasMore is False
+    assert len(streamed) == (2 if limit >= client.HISTORY_STREAM_THRESHOLD else 0)
+    await client.aclose()
+
+def test_max_concurrency_validated():
+    with pytest.raises(ValueError):
+        AsyncModexiaClient(api_key=API_KEY, max_concurrency=0)
+
+@pytest.mark.asyncio
+async def test_poll_pool_never_exceeds_main_pool():
+    small = AsyncModexiaClient(api_key=API_KEY, max_concurrency=4)
+    large = AsyncModexiaClient(api_key=API_KEY, max_concurrency=64)
+    assert small._semaphore("poll")._value == 4
+    assert large._semaphore("poll")._value == 16
+    await small.aclose()
+    await large.aclose()
+
+@pytest.mark.asyncio
+async def test_smart_fetch_prepay_compares_against_paid_terms(client, httpx_mock):
+    recipient = "0x1234567890123456789012345678901234567890"
+    other = "0x9999999999999999999999999999999999999999"
+    key = "provider.example/articles"
+    client._paywall_cache[key] = (recipient, 0.25)
+    transfer = client.transfer
+
+    async def racing_transfer(*args, **kwargs):
+        # A concurrent fetch learns the new terms while our payment is in flight
+        client._paywall_cache[key] = (other, 0.50)
+        return await transfer(*args, **kwargs)
+
+    client.transfer = racing_transfer
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/pay",
+        json={"success": True, "txId": "tx_old_terms"},
+        method="POST"
+    )
+    httpx_mock.add_response(
+        url="https://sandbox.modexia.software/api/v1/agent/transaction/tx_old_terms",
+        json={"state": "COMPLETE"},
+        method="GET"
+    )
+    httpx_mock.add_response(
+        url="https://provider.example/articles/4",
+        status_code=402,
+        headers={"WWW-Authenticate": f'L402 amount="0.50", destination="{other}"'},
+        method="GET"
+    )
+
+    response = await client.smart_fetch("GET", "https://provider.example/articles/4", prepay=True)
+
+    assert response.status_code == 402
+    assert len(httpx_mock.get_requests(url="https://provider.example/articles/4")) == 1
+    assert client._paywall_cache[key] == (other, 0.50)
+    await client.aclose()